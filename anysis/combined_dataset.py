@@ -1,40 +1,82 @@
+import glob
 import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
 
 # Path to the preprocessingdata folder
 preprocessed_data_dir = "../preprocessingdata"
 
-# List to store DataFrames
-data_frames = []
-
-# Loop through each year folder
-for year in os.listdir(preprocessed_data_dir):
-    year_path = os.path.join(preprocessed_data_dir, year)
-    if os.path.isdir(year_path):  # Check if it's a folder
-        for file in os.listdir(year_path):
-            if file.endswith(".csv"):  # Process only CSV files
-                file_path = os.path.join(year_path, file)
-                try:
-                    # Read each CSV file
-                    df = pd.read_csv(file_path)
-
-                    # Add Year and Month columns for reference
-                    df['Year'] = year
-                    df['Month'] = file[:2]  # Extract the first two characters as month (e.g., "01", "02")
-
-                    # Append the DataFrame to the list
-                    data_frames.append(df)
-                except Exception as e:
-                    print(f"Error reading file {file_path}: {e}")
-
-# Combine all DataFrames into one
-if data_frames:
-    all_data = pd.concat(data_frames, ignore_index=True)
+# Columns of each monthly CSV file (declared up front so every file is parsed with the same types)
+csv_schema = pa.schema([
+    ('DateTime', pa.timestamp('s')),
+    ('RATE A', pa.float64()),
+    ('RATE B', pa.float64()),
+    ('RATE C', pa.float64()),
+    ('Total', pa.float64()),
+])
+
+# Year comes from the folder name (<year>/<month>.csv)
+year_partitioning = pa.schema([('Year', pa.int16())])
+
+# Arrow CSV format (8 MB blocks, fixed column types)
+csv_format = ds.CsvFileFormat(
+    read_options=pv.ReadOptions(block_size=8 << 20),
+    convert_options=pv.ConvertOptions(column_types=csv_schema),
+)
+
+# Every <year>/<month>.csv file (only .csv files, as before); the dataset supplies the fixed schema and the Year partition column
+csv_paths = sorted(glob.glob(os.path.join(preprocessed_data_dir, "*", "*.csv")))
+dataset = ds.dataset(
+    csv_paths,
+    format=csv_format,
+    schema=pa.unify_schemas([csv_schema, year_partitioning]),
+    partitioning=ds.partitioning(year_partitioning),
+    partition_base_dir=preprocessed_data_dir,
+)
+
+# Read one file of the dataset and add its Month column (None if it cannot be read)
+def read_fragment(fragment):
+    try:
+        tbl = fragment.to_table(schema=dataset.schema)
+        month = int(os.path.basename(fragment.path)[:2])  # Month from the first two characters (e.g., "01Jan.csv" -> 1)
+        return tbl.append_column('Month', pa.array([month] * tbl.num_rows, pa.int8()))
+    except Exception as e:
+        print(f"Error reading file {fragment.path}: {e}")
+        return None
+
+# Read all files in parallel, skipping any that fail
+with ThreadPoolExecutor(max_workers=8) as ex:
+    tables = [tbl for tbl in ex.map(read_fragment, dataset.get_fragments()) if tbl is not None]
+
+# Combine all files into one DataFrame
+if tables:
+    all_data = pa.concat_tables(tables).to_pandas()
     print("Dataset created successfully!")
-    
-    # Save as CSV for future use
-    all_data.to_csv("combined_dataset.csv", index=False, encoding='utf-8-sig')
-    print("Combined dataset saved as 'combined_dataset.csv'")
+
+    # Store compact, typed columns so the dashboard does not need to re-parse them
+    for c in ('RATE A', 'RATE B', 'RATE C'):
+        all_data[c] = pd.to_numeric(all_data[c], downcast='float')  # float64 -> float32 (Total stays float64 for the exact headline sum)
+    all_data['DateTime'] = all_data['DateTime'].astype('datetime64[ns]')
+
+    # Precompute calendar columns used for filtering and grouping in the dashboard
+    all_data['MonthName'] = pd.Categorical.from_codes(all_data['Month'].to_numpy() - 1, categories=[
+        'January', 'February', 'March', 'April', 'May', 'June',
+        'July', 'August', 'September', 'October', 'November', 'December'])
+    all_data['Hour'] = all_data['DateTime'].dt.hour.astype('int8')
+    all_data['Day'] = all_data['DateTime'].dt.day.astype('int8')
+    all_data['Weekday'] = pd.Categorical(all_data['DateTime'].dt.day_name(),
+                                         categories=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+                                         ordered=True)
+
+    # Index on the filter/group keys, sorted so the dashboard can slice instead of masking
+    all_data = all_data.sort_values('DateTime').set_index(['Year', 'Month', 'Day', 'Hour']).sort_index()
+
+    # Save as Parquet for future use
+    all_data.to_parquet("combined_dataset.parquet", engine='pyarrow', compression='snappy')
+    print("Combined dataset saved as 'combined_dataset.parquet'")
 
 else:
     print("No data found in preprocessingdata folder.")
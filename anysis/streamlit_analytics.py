@@ -1,9 +1,8 @@
+import os
+from collections import namedtuple
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
 
 # Function to format numbers in "K" or "M"
 def format_number(value):
@@ -14,32 +13,96 @@ def format_number(value):
     else:
         return f"{value:.2f}"
 
-# Function to convert month number to name
-def month_name(month_num):
-    month_names = {
-        1: "January", 2: "February", 3: "March", 4: "April", 5: "May", 6: "June",
-        7: "July", 8: "August", 9: "September", 10: "October", 11: "November", 12: "December"
-    }
-    return month_names.get(month_num, "")
-
-# Load Dataset
-@st.cache
-def load_data():
-    data = pd.read_csv("anysis/combined_dataset.csv", parse_dates=["DateTime"])
-    data['MonthName'] = data['Month'].apply(lambda x: month_name(int(x)))  # Add MonthName column
-    return data
+# Vectorized format_number for arrays of values (e.g. chart labels)
+def format_numbers(values):
+    a = np.asarray(values, dtype=np.float64)
+    conditions = [a >= 1_000_000, a >= 1_000]
+    scales = np.select(conditions, [a / 1_000_000, a / 1_000], a)
+    suffix = np.select(conditions, ["M", "K"], "")
+    return np.char.add(np.char.mod("%.2f", scales), suffix)
+
+# Path to the dataset written by combined_dataset.py
+DATA_PATH = "anysis/combined_dataset.parquet"
+
+# Load Dataset (keyed on the file's modification time, so a rebuilt dataset is never served from the disk cache;
+# only the current file is kept in memory, older pickles stay on disk until `streamlit cache clear`)
+@st.cache_data(persist='disk', show_spinner=False, max_entries=1)
+def load_data(mtime):
+    return pd.read_parquet(DATA_PATH)
+
+# Filter Data (slice the sorted Year/Month/Day/Hour index)
+def filter_data(data, years, months, days):
+    # Levels where every value is selected are left unconstrained, so the default view needs no lookup at all
+    year_key = slice(None) if set(years) >= set(data.index.levels[0]) else list(years)
+    month_key = slice(None) if set(months) >= set(data.index.levels[1]) else list(months)
+    day_key = slice(None) if days[0] <= 1 and days[1] >= 31 else slice(days[0], days[1])
+    if year_key == month_key == day_key == slice(None):
+        return data
+    idx = pd.IndexSlice
+    return data.loc[idx[year_key, month_key, day_key, :], :]
+
+# Aggregated results for one filter selection
+Aggregates = namedtuple("Aggregates", [
+    "total_energy", "avg_energy", "yearly_usage", "monthly_data", "monthly_usage", "hour_agg",
+    "heatmap_data", "max_total", "max_datetime", "peak_hour", "rate_stats", "weekday_usage",
+])
+
+# Compute every aggregation once per filter selection (keyed on the filter tuples, not the DataFrame)
+@st.cache_data(max_entries=64)
+def compute_aggregates(mtime, years, months, days):
+    filtered_data = filter_data(load_data(mtime), years, months, days)
+
+    # Aggregations shared by the charts and the summary (one groupby pass per key)
+    # (unsorted groupbys; the small results are sorted afterwards where the charts need it)
+    yearly_usage = filtered_data.groupby(level='Year', observed=True, sort=False)['Total'].sum().sort_index()
+    monthly_data = (filtered_data.groupby(['Year', 'Month', 'MonthName'], observed=True, sort=False)['Total'].sum()
+                    .reset_index()
+                    .sort_values(['Year', 'Month']))
+    monthly_usage = monthly_data.groupby('MonthName', observed=True, sort=False)['Total'].sum()
+    hour_agg = filtered_data.groupby(level='Hour', observed=True, sort=False)['Total'].agg(['sum', 'mean']).sort_index()
+    heatmap_data = (filtered_data.groupby(['Hour', 'Day'], observed=True, sort=False)['Total']
+                    .mean()
+                    .unstack('Day')
+                    .sort_index()
+                    .sort_index(axis=1))
+
+    # Row with the highest electricity usage
+    max_pos = filtered_data['Total'].to_numpy().argmax()  # positional: the Year/Month/Day/Hour index is not unique
+
+    # RATE A/B/C statistics in a single pass
+    rate_stats = filtered_data[['RATE A', 'RATE B', 'RATE C']].agg(['max', 'min', 'mean', 'std'])
+
+    weekday_usage = filtered_data.groupby('Weekday', observed=True, sort=False)['Total'].sum().sort_values(ascending=False)
+
+    return Aggregates(
+        total_energy=filtered_data['Total'].sum(),
+        avg_energy=filtered_data['Total'].mean(),
+        yearly_usage=yearly_usage,
+        monthly_data=monthly_data,
+        monthly_usage=monthly_usage,
+        hour_agg=hour_agg,
+        heatmap_data=heatmap_data,
+        max_total=filtered_data['Total'].iat[max_pos],
+        max_datetime=filtered_data['DateTime'].iat[max_pos],
+        peak_hour=filtered_data.index.get_level_values('Hour')[max_pos],
+        rate_stats=rate_stats,
+        weekday_usage=weekday_usage,
+    )
 
 # Main App
 def main():
     st.title("Electricity Consumption Dashboard")
 
     # Load Data
-    data = load_data()
+    data_mtime = os.path.getmtime(DATA_PATH)
+    data = load_data(data_mtime)
 
     # Sidebar Filters
     st.sidebar.title("Filters")
-    year_filter = st.sidebar.multiselect("Select Year(s)", options=data['Year'].unique(), default=data['Year'].unique())
-    month_filter = st.sidebar.multiselect("Select Month(s)", options=data['Month'].unique(), default=data['Month'].unique())
+    year_options = data.index.unique(level='Year').tolist()  # plain ints (Year is stored as int16)
+    month_options = data.index.unique(level='Month').tolist()
+    year_filter = st.sidebar.multiselect("Select Year(s)", options=year_options, default=year_options)
+    month_filter = st.sidebar.multiselect("Select Month(s)", options=month_options, default=month_options)
     day_filter = st.sidebar.slider("Select Day Range", min_value=1, max_value=31, value=(1, 31))
 
     # Dynamic Header Title
@@ -54,36 +117,43 @@ def main():
     st.markdown(f"## {dynamic_title}")
 
     # Filter Data
-    filtered_data = data[
-        (data['Year'].isin(year_filter)) &
-        (data['Month'].isin(month_filter)) &
-        (data['DateTime'].dt.day.between(day_filter[0], day_filter[1]))
-    ]
+    years = tuple(year_filter)
+    months = tuple(month_filter)
+    filtered_data = filter_data(data, years, months, day_filter)
+    if filtered_data.empty:
+        st.warning("No data for the selected filters. Please adjust the year, month or day selection.")
+        return
+
+    # Aggregate Data (cached per filter selection)
+    agg = compute_aggregates(data_mtime, years, months, tuple(day_filter))
+    yearly_usage = agg.yearly_usage
+    monthly_data = agg.monthly_data
+    monthly_usage = agg.monthly_usage
+    hour_agg = agg.hour_agg
 
     # Overview Metrics
     st.markdown("### Overall Metrics")
-    total_energy = filtered_data['Total'].sum()
-    avg_energy = filtered_data['Total'].mean()
-    st.metric("Total Energy (kWh)", f"{total_energy:,.2f}")
-    st.metric("Average Energy per Interval (kWh)", format_number(avg_energy))
+    st.metric("Total Energy (kWh)", f"{agg.total_energy:,.2f}")
+    st.metric("Average Energy per Interval (kWh)", format_number(agg.avg_energy))
 
     # Yearly Analysis
     st.markdown(f"### Yearly Electricity Consumption ({start_year} - {end_year})")
-    yearly_data = filtered_data.groupby('Year')['Total'].sum().reset_index()
-    fig, ax = plt.subplots(figsize=(10, 6))
-    bars = sns.barplot(x='Year', y='Total', data=yearly_data, ax=ax, color="skyblue")
-    for i, bar in enumerate(bars.patches):
-        value = yearly_data.iloc[i]['Total']
-        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + max(yearly_data['Total']) * 0.01,
-                format_number(value), ha='center', va='bottom', fontsize=10)
-    ax.set_title("Yearly Electricity Consumption")
-    ax.set_xlabel("Year")
-    ax.set_ylabel("Total Energy (kWh)")
-    st.pyplot(fig)
+    yearly_data = yearly_usage.reset_index()
+    import plotly.express as px  # imported on first use to keep app start-up light
+    fig = px.bar(
+        yearly_data,
+        x="Year",
+        y="Total",
+        text=format_numbers(yearly_data['Total']),
+        title="Yearly Electricity Consumption",
+        labels={"Year": "Year", "Total": "Total Energy (kWh)"},
+    )
+    fig.update_traces(textposition="outside", marker_color="skyblue")
+    fig.update_xaxes(type="category")
+    st.plotly_chart(fig, use_container_width=True)
 
     # Interactive Line Chart for Monthly Data
     st.markdown("### Monthly Electricity Consumption (Interactive)")
-    monthly_data = filtered_data.groupby(['Year', 'Month', 'MonthName'])['Total'].sum().reset_index()
     fig = px.line(
         monthly_data,
         x="MonthName",
@@ -108,13 +178,13 @@ def main():
 
     # Daily Trends (Interactive Line Chart)
     st.markdown("### Daily Trends (Interactive)")
-    daily_data = filtered_data.groupby(filtered_data['DateTime'].dt.hour)['Total'].mean().reset_index()
+    daily_data = hour_agg['mean'].rename('Total').reset_index()
     fig = px.line(
         daily_data,
-        x="DateTime",
+        x="Hour",
         y="Total",
         title="Average Electricity Usage by Hour",
-        labels={"DateTime": "Hour", "Total": "Average Energy (kWh)"},
+        labels={"Hour": "Hour", "Total": "Average Energy (kWh)"},
     )
     fig.update_traces(mode="lines+markers", hovertemplate="Hour: %{x}<br>Average: %{y:,.2f} kWh<extra></extra>")
     st.plotly_chart(fig, use_container_width=True)
@@ -131,14 +201,13 @@ def main():
     # st.pyplot(fig)
     # Hourly Electricity Usage Heatmap (Interactive)
     st.markdown("### Hourly Electricity Usage Heatmap (Interactive)")
-    heatmap_data = filtered_data.pivot_table(index=filtered_data['DateTime'].dt.hour, 
-                                             columns=filtered_data['DateTime'].dt.day, 
-                                             values='Total', aggfunc='mean').reset_index()
+    heatmap_data = agg.heatmap_data
+    import plotly.graph_objects as go  # imported on first use to keep app start-up light
 
     fig = go.Figure(data=go.Heatmap(
-        z=heatmap_data.iloc[:, 1:].values,  # Heatmap values
-        x=heatmap_data.columns[1:],  # Day columns
-        y=heatmap_data['DateTime'],  # Hour index
+        z=np.ascontiguousarray(heatmap_data.values, dtype=np.float32),  # Heatmap values
+        x=heatmap_data.columns.to_numpy(),  # Day columns
+        y=heatmap_data.index.to_numpy(),  # Hour index
         colorscale='YlGnBu',
         hoverongaps=False,
         colorbar=dict(title="Energy (kWh)")
@@ -166,48 +235,37 @@ def main():
         return th if language == "ภาษาไทย" else en
 
     # 1. Year with maximum and minimum electricity usage
-    yearly_usage = filtered_data.groupby('Year')['Total'].sum()
     max_year = yearly_usage.idxmax()
     min_year = yearly_usage.idxmin()
     st.markdown(f"- {bilingual_text('ปีที่ใช้ไฟฟ้ามากที่สุด:', 'Year with the highest electricity usage:')} {max_year} ({format_number(yearly_usage[max_year])} kWh)")
     st.markdown(f"- {bilingual_text('ปีที่ใช้ไฟฟ้าน้อยที่สุด:', 'Year with the lowest electricity usage:')} {min_year} ({format_number(yearly_usage[min_year])} kWh)")
 
     # 2. Month with maximum and minimum electricity usage
-    monthly_usage = filtered_data.groupby('Month')['Total'].sum()
-    max_month = monthly_usage.idxmax()
-    min_month = monthly_usage.idxmin()
-    max_month_name = month_name(int(max_month))
-    min_month_name = month_name(int(min_month))
-    st.markdown(f"- {bilingual_text('เดือนที่ใช้ไฟฟ้ามากที่สุด:', 'Month with the highest electricity usage:')} {max_month_name} ({format_number(monthly_usage[max_month])} kWh)")
-    st.markdown(f"- {bilingual_text('เดือนที่ใช้ไฟฟ้าน้อยที่สุด:', 'Month with the lowest electricity usage:')} {min_month_name} ({format_number(monthly_usage[min_month])} kWh)")
+    max_month_name = monthly_usage.idxmax()
+    min_month_name = monthly_usage.idxmin()
+    st.markdown(f"- {bilingual_text('เดือนที่ใช้ไฟฟ้ามากที่สุด:', 'Month with the highest electricity usage:')} {max_month_name} ({format_number(monthly_usage[max_month_name])} kWh)")
+    st.markdown(f"- {bilingual_text('เดือนที่ใช้ไฟฟ้าน้อยที่สุด:', 'Month with the lowest electricity usage:')} {min_month_name} ({format_number(monthly_usage[min_month_name])} kWh)")
 
     # 3. Hour with maximum and minimum electricity usage
-    hourly_usage = filtered_data.groupby(filtered_data['DateTime'].dt.hour)['Total'].sum()
+    hourly_usage = hour_agg['sum']
     max_hour = hourly_usage.idxmax()
     min_hour = hourly_usage.idxmin()
     st.markdown(f"- {bilingual_text('ช่วงเวลาที่ใช้ไฟฟ้ามากที่สุด:', 'Hour with the highest electricity usage:')} {max_hour}:00 ({format_number(hourly_usage[max_hour])} kWh)")
     st.markdown(f"- {bilingual_text('ช่วงเวลาที่ใช้ไฟฟ้าน้อยที่สุด:', 'Hour with the lowest electricity usage:')} {min_hour}:00 ({format_number(hourly_usage[min_hour])} kWh)")
 
     # 4. DateTime with the highest electricity usage
-    max_total = filtered_data['Total'].max()
-    max_total_row = filtered_data[filtered_data['Total'] == max_total]
-    max_datetime = max_total_row['DateTime'].iloc[0]
+    max_total = agg.max_total
+    max_datetime = agg.max_datetime
     st.markdown(f"- {bilingual_text('วันที่และเวลาที่ใช้ไฟฟ้ามากที่สุด:', 'DateTime with the highest electricity usage:')} {max_datetime} ({format_number(max_total)} kWh)")
 
     # 5. RATE Analysis (A, B, C)
     st.markdown(bilingual_text("### การวิเคราะห์ RATE (A, B, C)", "### RATE Analysis (A, B, C)"))
-    rate_stats = {}
-    for rate in ['RATE A', 'RATE B', 'RATE C']:
-        max_rate = filtered_data[rate].max()
-        min_rate = filtered_data[rate].min()
-        avg_rate = filtered_data[rate].mean()
-        std_rate = filtered_data[rate].std()
-        rate_stats[rate] = {
-            "Max": max_rate,
-            "Min": min_rate,
-            "Avg": avg_rate,
-            "Std Dev": std_rate
-        }
+    rate_stats = agg.rate_stats
+    for rate in rate_stats.columns:
+        max_rate = rate_stats.loc['max', rate]
+        min_rate = rate_stats.loc['min', rate]
+        avg_rate = rate_stats.loc['mean', rate]
+        std_rate = rate_stats.loc['std', rate]
         st.markdown(f"- **{rate}:**")
         st.markdown(f"  - {bilingual_text('ค่าสูงสุด:', 'Maximum:')} {format_number(max_rate)}")
         st.markdown(f"  - {bilingual_text('ค่าต่ำสุด:', 'Minimum:')} {format_number(min_rate)}")
@@ -217,12 +275,11 @@ def main():
     # Additional Insights
     st.markdown(bilingual_text("### การวิเคราะห์เพิ่มเติม", "### Additional Insights"))
     # Identify the most frequent hour with peak usage
-    peak_hour_freq = filtered_data[filtered_data['Total'] == filtered_data['Total'].max()]['DateTime'].dt.hour.mode()[0]
+    peak_hour_freq = agg.peak_hour
     st.markdown(f"- {bilingual_text('ช่วงเวลาที่เกิด Peak สูงสุดบ่อยที่สุด:', 'Most frequent peak usage hour:')} {peak_hour_freq}:00")
 
     # Find the distribution of usage across weekdays
-    filtered_data['Weekday'] = filtered_data['DateTime'].dt.day_name()
-    weekday_usage = filtered_data.groupby('Weekday')['Total'].sum().sort_values(ascending=False)
+    weekday_usage = agg.weekday_usage
     st.markdown(f"- {bilingual_text('วันที่ใช้ไฟฟ้ามากที่สุดในสัปดาห์:', 'Weekday with the highest total electricity usage:')} {weekday_usage.idxmax()} ({format_number(weekday_usage.max())} kWh)")
     st.markdown(f"- {bilingual_text('วันที่ใช้ไฟฟ้าน้อยที่สุดในสัปดาห์:', 'Weekday with the lowest total electricity usage:')} {weekday_usage.idxmin()} ({format_number(weekday_usage.min())} kWh)")
 